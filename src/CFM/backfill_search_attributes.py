@@ -0,0 +1,85 @@
+import boto3
+import os
+import re
+import sys
+from botocore.exceptions import ClientError
+
+# Same tokenization the ingest Lambdas use to build each item's search_tokens set
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Attributes the search attributes are derived from, plus the ones that show an
+# item was already written with them
+SOURCE_FIELDS = ('file_id', 'file_name', 'content_type', 'labels', 'text_detected', 'text_content')
+SEARCH_FIELDS = ('content_category', 'file_name_lc', 'name_initial')
+
+def backfill(table):
+    """Add the search attributes to every metadata item written before they existed"""
+    fields = SOURCE_FIELDS + SEARCH_FIELDS
+    scan_params = {
+        'ProjectionExpression': ', '.join(f'#f{i}' for i in range(len(fields))),
+        'ExpressionAttributeNames': {f'#f{i}': field for i, field in enumerate(fields)}
+    }
+
+    scanned = updated = 0
+    while True:
+        response = table.scan(**scan_params)
+        for item in response['Items']:
+            scanned += 1
+            if all(field in item for field in SEARCH_FIELDS):
+                continue
+            if backfill_item(table, item):
+                updated += 1
+
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_params['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    return scanned, updated
+
+def backfill_item(table, item):
+    """Set the search attributes of one item from its stored metadata"""
+    # Uploads store the base name and the analyzer the full key; both index the base name
+    file_name_lc = item.get('file_name', '').rpartition('/')[2].lower()
+    texts = [file_name_lc]
+    texts.extend(item.get('labels', []))
+    texts.extend(item.get('text_detected', []))
+    texts.extend(item.get('text_content', []))
+    search_tokens = set(TOKEN_RE.findall(' '.join(texts).lower()))
+
+    assignments = []
+    values = {}
+    if 'content_type' in item:
+        assignments.append('content_category = :cat')
+        values[':cat'] = item['content_type'].partition('/')[0]
+    if file_name_lc:
+        assignments.append('file_name_lc = :lc, name_initial = :ni')
+        values[':lc'] = file_name_lc
+        values[':ni'] = file_name_lc[0]
+
+    update_expression = 'SET ' + ', '.join(assignments) if assignments else ''
+    if search_tokens:
+        # Adding to the set keeps any tokens stored since, so reruns are harmless
+        update_expression += ' ADD search_tokens :tokens'
+        values[':tokens'] = search_tokens
+    if not values:
+        return False
+
+    try:
+        table.update_item(
+            Key={'file_id': item['file_id']},
+            UpdateExpression=update_expression.strip(),
+            ConditionExpression='attribute_exists(file_id)',
+            ExpressionAttributeValues=values
+        )
+        return True
+    except ClientError as e:
+        # Items deleted during the scan, or already at the size limit, are skipped
+        if e.response['Error']['Code'] not in ('ConditionalCheckFailedException', 'ValidationException'):
+            raise
+        print(f"Skipping {item['file_id']}: {str(e)}")
+        return False
+
+if __name__ == '__main__':
+    table_name = sys.argv[1] if len(sys.argv) > 1 else os.environ['TABLE_NAME']
+    scanned, updated = backfill(boto3.resource('dynamodb').Table(table_name))
+    print(f"Scanned {scanned} items, updated {updated}")
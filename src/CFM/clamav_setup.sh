@@ -76,9 +76,10 @@ RUN wget https://www.clamav.net/downloads/production/clamav-0.103.7.tar.gz && \
     make install
 
 # Package binaries
-RUN mkdir -p /output/bin /output/lib /output/lib64 /output/var/lib/clamav && \
+RUN mkdir -p /output/bin /output/etc /output/lib /output/lib64 /output/var/lib/clamav && \
     cp /usr/local/bin/clamscan /output/bin/ && \
     cp /usr/local/bin/freshclam /output/bin/ && \
+    cp /usr/local/sbin/clamd /output/bin/ && \
     cp /usr/local/lib/libclamav.so* /output/lib/ && \
     cp /usr/local/lib/libclammspack.so* /output/lib/ && \
     cp /usr/local/lib/libclamunrar.so* /output/lib/
@@ -89,6 +90,22 @@ RUN wget http://database.clamav.net/main.cvd && \
     wget http://database.clamav.net/daily.cvd && \
     wget http://database.clamav.net/bytecode.cvd
 
+# clamd config; the scanner Lambda starts clamd at init and streams files over the socket
+# Scan limits match the Lambda's 500 MB cap; content past them is reported as
+# Heuristics.Limits.Exceeded instead of passing as OK
+RUN printf '%s\n' \
+    'LocalSocket /tmp/clamd.sock' \
+    'PidFile /tmp/clamd.pid' \
+    'TemporaryDirectory /tmp' \
+    'DatabaseDirectory /opt/var/lib/clamav' \
+    'MaxThreads 4' \
+    'MaxRecursion 8' \
+    'StreamMaxLength 500M' \
+    'MaxFileSize 500M' \
+    'MaxScanSize 500M' \
+    'AlertExceedsMax yes' \
+    'LogSyslog yes' > /output/etc/clamd.conf
+
 VOLUME ["/output"]
 EOL
 
@@ -5,6 +5,8 @@ from aws_cdk import (
     aws_lambda as lambda_,
     aws_apigateway as apigw,
     aws_iam as iam,
+    aws_sns as sns,
+    aws_sns_subscriptions as subscriptions,
     RemovalPolicy,
     Duration,
 )
@@ -37,6 +39,63 @@ class FileManagerStack(Stack):
             billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST
         )
 
+        # CloudFormation adds at most one GSI to an existing table per update,
+        # so stacks deployed before these indexes roll them out in stages with
+        # -c metadata_index_stage=1, 2 and 3; new tables get all of them at once
+        index_stage = int(self.node.try_get_context("metadata_index_stage") or 3)
+
+        if index_stage >= 1:
+            # Resolve file_id from an S3 location without scanning the table
+            metadata_table.add_global_secondary_index(
+                index_name="bucket-key-index",
+                partition_key=dynamodb.Attribute(
+                    name="bucket",
+                    type=dynamodb.AttributeType.STRING
+                ),
+                sort_key=dynamodb.Attribute(
+                    name="key",
+                    type=dynamodb.AttributeType.STRING
+                ),
+                projection_type=dynamodb.ProjectionType.KEYS_ONLY
+            )
+
+        if index_stage >= 2:
+            # Search by top-level MIME type and upload date range
+            metadata_table.add_global_secondary_index(
+                index_name="content_category-last_modified-index",
+                partition_key=dynamodb.Attribute(
+                    name="content_category",
+                    type=dynamodb.AttributeType.STRING
+                ),
+                sort_key=dynamodb.Attribute(
+                    name="last_modified",
+                    type=dynamodb.AttributeType.STRING
+                )
+            )
+
+        if index_stage >= 3:
+            # Case-insensitive file name prefix search
+            metadata_table.add_global_secondary_index(
+                index_name="name_initial-file_name_lc-index",
+                partition_key=dynamodb.Attribute(
+                    name="name_initial",
+                    type=dynamodb.AttributeType.STRING
+                ),
+                sort_key=dynamodb.Attribute(
+                    name="file_name_lc",
+                    type=dynamodb.AttributeType.STRING
+                )
+            )
+
+        # Async Textract jobs report completion on this topic, publishing
+        # through a role that Textract assumes
+        textract_topic = sns.Topic(self, "TextractCompletionTopic")
+        textract_role = iam.Role(
+            self, "TextractPublishRole",
+            assumed_by=iam.ServicePrincipal("textract.amazonaws.com")
+        )
+        textract_topic.grant_publish(textract_role)
+
         # Create Lambda functions
         upload_handler = lambda_.Function(
             self, "UploadHandler",
@@ -56,11 +115,30 @@ class FileManagerStack(Stack):
             code=lambda_.Code.from_asset("lambda/analyzer"),
             handler="index.handler",
             environment={
-                "TABLE_NAME": metadata_table.table_name
+                "TABLE_NAME": metadata_table.table_name,
+                "TEXTRACT_SNS_TOPIC_ARN": textract_topic.topic_arn,
+                "TEXTRACT_ROLE_ARN": textract_role.role_arn
             },
             timeout=Duration.minutes(5)
         )
 
+        textract_collector = lambda_.Function(
+            self, "TextractResultCollector",
+            runtime=lambda_.Runtime.PYTHON_3_9,
+            code=lambda_.Code.from_asset("lambda/analyzer"),
+            handler="index.textract_result_handler",
+            environment={
+                "TABLE_NAME": metadata_table.table_name
+            },
+            timeout=Duration.minutes(1),
+            # Notices that still fail after Lambda's async retries are kept
+            # here instead of being dropped
+            dead_letter_queue_enabled=True
+        )
+        textract_topic.add_subscription(
+            subscriptions.LambdaSubscription(textract_collector)
+        )
+
         search_handler = lambda_.Function(
             self, "SearchHandler",
             runtime=lambda_.Runtime.PYTHON_3_9,
@@ -77,6 +155,8 @@ class FileManagerStack(Stack):
         storage_bucket.grant_read(metadata_analyzer)
         metadata_table.grant_read_write_data(upload_handler)
         metadata_table.grant_read_write_data(metadata_analyzer)
+        metadata_table.grant_read_write_data(textract_collector)
+        textract_role.grant_pass_role(metadata_analyzer)
         metadata_table.grant_read_data(search_handler)
 
         # Create API Gateway
@@ -99,7 +179,13 @@ class FileManagerStack(Stack):
                 "rekognition:DetectLabels",
                 "rekognition:DetectText",
                 "textract:DetectDocumentText",
-                "textract:AnalyzeDocument"
+                "textract:AnalyzeDocument",
+                "textract:StartDocumentTextDetection"
             ],
             resources=["*"]
+        ))
+
+        textract_collector.add_to_role_policy(iam.PolicyStatement(
+            actions=["textract:GetDocumentTextDetection"],
+            resources=["*"]
         ))
\ No newline at end of file
@@ -3,20 +3,93 @@ import json
 import os
 import mimetypes
 import hashlib
+import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from botocore.config import Config
+from botocore.exceptions import ClientError
 
-s3 = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
-rekognition = boto3.client('rekognition')
-textract = boto3.client('textract')
+# Shared client config: pooled keep-alive connections, fail-fast connects and
+# adaptive retries for the Rekognition/Textract/DynamoDB round-trips
+BOTO_CONFIG = Config(
+    max_pool_connections=50,
+    tcp_keepalive=True,
+    connect_timeout=3,
+    read_timeout=30,
+    retries={'max_attempts': 3, 'mode': 'adaptive'}
+)
+
+s3 = boto3.client('s3', config=BOTO_CONFIG)
+dynamodb = boto3.resource('dynamodb', config=BOTO_CONFIG)
+rekognition = boto3.client('rekognition', config=BOTO_CONFIG)
+textract = boto3.client('textract', config=BOTO_CONFIG)
 table = dynamodb.Table(os.environ['TABLE_NAME'])
 
+# Async Textract notifications; documents are analyzed synchronously without them
+TEXTRACT_SNS_TOPIC_ARN = os.environ.get('TEXTRACT_SNS_TOPIC_ARN')
+TEXTRACT_ROLE_ARN = os.environ.get('TEXTRACT_ROLE_ARN')
+
+# Shared pools, created once rather than per invocation: one for the records in
+# an event and one for the independent AWS calls made while analyzing a record
+MAX_RECORD_WORKERS = 16
+record_executor = ThreadPoolExecutor(max_workers=MAX_RECORD_WORKERS)
+executor = ThreadPoolExecutor(max_workers=2 * MAX_RECORD_WORKERS)
+
+# DynamoDB items are limited to 400 KB; extracted text is cut to this many
+# bytes so it and the tokens derived from it fit next to the other metadata
+TEXT_CONTENT_MAX_BYTES = 150 * 1024
+
+# BatchWriteItem accepts at most this many items per request
+DYNAMODB_BATCH_SIZE = 25
+
+# Lowercased alphanumeric runs, stored as a string set for token search
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
 def handler(event, context):
     """Handler for processing file uploads and extracting metadata"""
+    try:
+        # Analyze every file in the event concurrently; each is bound on AWS calls
+        records = [record for record in event.get('Records', []) if 's3' in record]
+        extracted = list(record_executor.map(extract_metadata, records))
+        metadata_items = [metadata for metadata in extracted if metadata is not None]
+        
+        # Store all results with batched writes
+        metadata_items = store_metadata_batch(metadata_items)
+        
+        # Start async text detection only for stored items, so every completion
+        # notice finds the item it updates
+        stored_ids = {metadata['file_id'] for metadata in metadata_items}
+        pending = [
+            (record['s3']['bucket']['name'], record['s3']['object']['key'], metadata['file_id'])
+            for record, metadata in zip(records, extracted)
+            if metadata is not None and metadata['file_id'] in stored_ids
+            and metadata.get('text_analysis_status') == 'processing'
+        ]
+        list(record_executor.map(lambda document: start_text_detection(*document), pending))
+        
+        return {
+            'statusCode': 200,
+            'body': json.dumps({
+                'message': 'Metadata extraction complete',
+                'file_ids': [metadata['file_id'] for metadata in metadata_items]
+            })
+        }
+        
+    except Exception as e:
+        print(f"Error processing file: {str(e)}")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({
+                'error': str(e)
+            })
+        }
+
+def extract_metadata(record):
+    """Extract metadata for the file referenced by a single S3 event record"""
     try:
         # Get file information from S3 event
-        bucket = event['Records'][0]['s3']['bucket']['name']
-        key = event['Records'][0]['s3']['object']['key']
+        bucket = record['s3']['bucket']['name']
+        key = record['s3']['object']['key']
         
         # Generate unique file ID
         file_id = hashlib.md5(f"{bucket}{key}{datetime.now()}".encode()).hexdigest()
@@ -31,6 +104,7 @@ def handler(event, context):
             'content_type': response.get('ContentType', 'application/octet-stream'),
             'etag': response['ETag'],
         }
+        basic_metadata['content_category'] = basic_metadata['content_type'].partition('/')[0]
         
         # Detect file type and process accordingly
         content_type = basic_metadata['content_type']
@@ -40,43 +114,43 @@ def handler(event, context):
             enhanced_metadata = process_image(bucket, key)
         elif content_type.startswith('application/pdf') or content_type.startswith('text/'):
             enhanced_metadata = process_document(bucket, key)
-            
-        # Combine and store metadata
+        
+        # Combine metadata
         metadata = {**basic_metadata, **enhanced_metadata}
-        store_metadata(metadata)
+        search_tokens = build_search_tokens(metadata)
+        if search_tokens:
+            metadata['search_tokens'] = search_tokens
+        # Keys of the name index, for case-insensitive file name prefix search
+        file_name_lc = key.rpartition('/')[2].lower()
+        if file_name_lc:
+            metadata['file_name_lc'] = file_name_lc
+            metadata['name_initial'] = file_name_lc[0]
         
-        return {
-            'statusCode': 200,
-            'body': json.dumps({
-                'message': 'Metadata extraction complete',
-                'file_id': file_id
-            })
-        }
+        return metadata
         
     except Exception as e:
-        print(f"Error processing file: {str(e)}")
-        return {
-            'statusCode': 500,
-            'body': json.dumps({
-                'error': str(e)
-            })
-        }
+        # Skip this record so the rest of the event is still stored
+        print(f"Error extracting metadata: {str(e)}")
+        return None
 
 def process_image(bucket, key):
     """Process image files using Rekognition"""
     try:
-        # Detect labels
-        label_response = rekognition.detect_labels(
+        # Detect labels and text concurrently; the two calls are independent
+        labels_future = executor.submit(
+            rekognition.detect_labels,
             Image={'S3Object': {'Bucket': bucket, 'Name': key}},
             MaxLabels=10,
             MinConfidence=70
         )
-        
-        # Detect text in image
-        text_response = rekognition.detect_text(
+        text_future = executor.submit(
+            rekognition.detect_text,
             Image={'S3Object': {'Bucket': bucket, 'Name': key}}
         )
         
+        label_response = labels_future.result()
+        text_response = text_future.result()
+        
         return {
             'labels': [label['Name'] for label in label_response['Labels']],
             'text_detected': [text['DetectedText'] for text in text_response['TextDetections']],
@@ -90,31 +164,194 @@ def process_image(bucket, key):
 def process_document(bucket, key):
     """Process documents using Textract"""
     try:
+        if TEXTRACT_SNS_TOPIC_ARN and TEXTRACT_ROLE_ARN:
+            # The handler starts an async job with start_text_detection once
+            # the item is stored
+            return {
+                'text_analysis_status': 'processing',
+                'analysis_type': 'document'
+            }
+        
         # Detect document text
         response = textract.detect_document_text(
             Document={'S3Object': {'Bucket': bucket, 'Name': key}}
         )
         
-        # Extract text blocks
-        text_blocks = []
-        for block in response['Blocks']:
-            if block['BlockType'] == 'LINE':
-                text_blocks.append(block['Text'])
-                
-        return {
-            'text_content': text_blocks,
-            'page_count': len(set(block['Page'] for block in response['Blocks'] if 'Page' in block)),
-            'analysis_type': 'document'
-        }
+        summary = summarize_text_blocks(response['Blocks'])
+        summary['text_content'] = truncate_text_lines(summary['text_content'], TEXT_CONTENT_MAX_BYTES)
+        return {**summary, 'analysis_type': 'document'}
         
     except Exception as e:
         print(f"Error processing document: {str(e)}")
         return {'analysis_type': 'document', 'error': str(e)}
 
-def store_metadata(metadata):
-    """Store extracted metadata in DynamoDB"""
+def summarize_text_blocks(blocks):
+    """Collect text lines and the page count from Textract blocks"""
+    # Collect text lines and the highest page number in a single pass over the
+    # blocks; Textract numbers pages 1..N contiguously
+    text_blocks = []
+    page_count = 0
+    for block in blocks:
+        if block['BlockType'] == 'LINE':
+            text_blocks.append(block['Text'])
+        page = block.get('Page', 0)
+        if page > page_count:
+            page_count = page
+            
+    return {
+        'text_content': text_blocks,
+        'page_count': page_count
+    }
+
+def start_text_detection(bucket, key, file_id):
+    """Start an async text detection job for a stored document"""
     try:
-        table.put_item(Item=metadata)
+        # textract_result_handler stores the text when Textract reports
+        # completion on the SNS topic
+        response = textract.start_document_text_detection(
+            DocumentLocation={'S3Object': {'Bucket': bucket, 'Name': key}},
+            JobTag=file_id,
+            NotificationChannel={
+                'SNSTopicArn': TEXTRACT_SNS_TOPIC_ARN,
+                'RoleArn': TEXTRACT_ROLE_ARN
+            }
+        )
+        table.update_item(
+            Key={'file_id': file_id},
+            UpdateExpression='SET textract_job_id = :job',
+            ConditionExpression='attribute_exists(file_id)',
+            ExpressionAttributeValues={':job': response['JobId']}
+        )
+        
+    except Exception as e:
+        print(f"Error starting text detection: {str(e)}")
+        try:
+            mark_text_detection_failed(file_id)
+        except Exception as e:
+            print(f"Error marking text detection failed: {str(e)}")
+
+def textract_result_handler(event, context):
+    """Handler for Textract job completion notifications delivered through SNS"""
+    for record in event.get('Records', []):
+        message = json.loads(record['Sns']['Message'])
+        store_text_detection(message['JobTag'], message['JobId'], message['Status'])
+        
+    return {'statusCode': 200}
+
+def iter_text_detection_blocks(job_id):
+    """Yield the blocks of a finished text detection job across all result pages"""
+    params = {'JobId': job_id, 'MaxResults': 1000}
+    while True:
+        response = textract.get_document_text_detection(**params)
+        yield from response['Blocks']
+        if 'NextToken' not in response:
+            break
+        params['NextToken'] = response['NextToken']
+
+def store_text_detection(file_id, job_id, status):
+    """Store the outcome of an async text detection job on the file's metadata"""
+    try:
+        if status != 'SUCCEEDED':
+            mark_text_detection_failed(file_id)
+            return
+        
+        summary = summarize_text_blocks(iter_text_detection_blocks(job_id))
+        text_content = truncate_text_lines(summary['text_content'], TEXT_CONTENT_MAX_BYTES)
+        update_expression = 'SET text_content = :text, page_count = :pages, text_analysis_status = :status'
+        values = {
+            ':text': text_content,
+            ':pages': summary['page_count'],
+            ':status': 'completed'
+        }
+        
+        # Add the document's tokens to those already stored for the file name
+        search_tokens = set(TOKEN_RE.findall(' '.join(text_content).lower()))
+        if search_tokens:
+            update_expression += ' ADD search_tokens :tokens'
+            values[':tokens'] = search_tokens
+        
+        # The item is stored before its job starts, so a failed conditional
+        # check means it was deleted since; raising sends the notice through
+        # Lambda's retries to the collector's dead-letter queue rather than
+        # creating a partial item
+        try:
+            table.update_item(
+                Key={'file_id': file_id},
+                UpdateExpression=update_expression,
+                ConditionExpression='attribute_exists(file_id)',
+                ExpressionAttributeValues=values
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ValidationException':
+                raise
+            # The item would still exceed the size limit; retrying cannot succeed
+            print(f"Error storing text detection results for {file_id}: {str(e)}")
+            mark_text_detection_failed(file_id)
+        
+    except Exception as e:
+        print(f"Error storing text detection results: {str(e)}")
+        raise e
+
+def mark_text_detection_failed(file_id):
+    """Record that text detection produced no stored text for the file"""
+    table.update_item(
+        Key={'file_id': file_id},
+        UpdateExpression='SET text_analysis_status = :status',
+        ConditionExpression='attribute_exists(file_id)',
+        ExpressionAttributeValues={':status': 'failed'}
+    )
+
+def truncate_text_lines(lines, max_bytes):
+    """Keep the leading text lines that fit within max_bytes of UTF-8"""
+    kept = []
+    total = 0
+    for line in lines:
+        total += len(line.encode())
+        if total > max_bytes:
+            break
+        kept.append(line)
+    return kept
+
+def build_search_tokens(metadata):
+    """Collect the lowercased search tokens for a file's name and extracted content"""
+    texts = [metadata['file_name'].rpartition('/')[2]]
+    texts.extend(metadata.get('labels', []))
+    texts.extend(metadata.get('text_detected', []))
+    texts.extend(metadata.get('text_content', []))
+    
+    return set(TOKEN_RE.findall(' '.join(texts).lower()))
+
+def store_metadata_batch(metadata_items):
+    """Store extracted metadata in DynamoDB using batched writes, returning the items stored"""
+    try:
+        stored = []
+        for i in range(0, len(metadata_items), DYNAMODB_BATCH_SIZE):
+            chunk = metadata_items[i:i + DYNAMODB_BATCH_SIZE]
+            try:
+                # batch_writer sends the chunk as one BatchWriteItem request and
+                # resubmits any unprocessed items
+                with table.batch_writer(overwrite_by_pkeys=['file_id']) as batch:
+                    for metadata in chunk:
+                        batch.put_item(Item=metadata)
+                stored.extend(chunk)
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'ValidationException':
+                    raise
+                # One invalid item rejects the whole request; write the chunk
+                # item by item so only the invalid ones are skipped
+                stored.extend(metadata for metadata in chunk if store_metadata(metadata))
+        return stored
     except Exception as e:
         print(f"Error storing metadata: {str(e)}")
-        raise e
\ No newline at end of file
+        raise e
+
+def store_metadata(metadata):
+    """Store one item's metadata, returning False if DynamoDB rejects it as invalid"""
+    try:
+        table.put_item(Item=metadata)
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ValidationException':
+            raise
+        print(f"Error storing metadata for {metadata['file_id']}: {str(e)}")
+        return False
\ No newline at end of file
@@ -1,11 +1,76 @@
-import boto3
 import json
 import os
-from boto3.dynamodb.conditions import Key, Attr
-from datetime import datetime, timedelta
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from operator import itemgetter
+from botocore.config import Config
+from botocore.session import get_session
 
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ['TABLE_NAME'])
+# orjson serializes responses several times faster; fall back to json without it
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Shared client config: a keep-alive pool that covers the parallel scan
+# segments, and standard retries
+BOTO_CONFIG = Config(
+    max_pool_connections=32,
+    tcp_keepalive=True,
+    retries={'max_attempts': 3, 'mode': 'standard'}
+)
+
+# Only the low-level client is used, so botocore is enough; skipping boto3's
+# session and resource modules shortens cold starts. With a DAX cluster
+# configured, repeated queries and scans are served from its cache; the DAX
+# client takes the same low-level calls and raw attribute values
+DAX_ENDPOINT = os.environ.get('DAX_ENDPOINT')
+if DAX_ENDPOINT:
+    from amazondax import AmazonDaxClient
+    dynamodb = AmazonDaxClient(endpoints=[DAX_ENDPOINT], region_name=os.environ['AWS_REGION'])
+else:
+    dynamodb = get_session().create_client('dynamodb', config=BOTO_CONFIG)
+TABLE_NAME = os.environ['TABLE_NAME']
+
+# GSI on the top-level MIME type ("image", "text", ...) sorted by last_modified
+CONTENT_CATEGORY_INDEX = 'content_category-last_modified-index'
+CONTENT_CATEGORIES = frozenset([
+    'application', 'audio', 'font', 'image', 'message', 'model', 'multipart', 'text', 'video'
+])
+
+# GSI on the first character of the lowercased file name, sorted by the full
+# lowercased name, for case-insensitive prefix search
+NAME_PREFIX_INDEX = 'name_initial-file_name_lc-index'
+
+# Attributes returned for each result; text_content is only read on request
+RESULT_FIELDS = ('file_id', 'file_name', 'size', 'last_modified', 'content_type', 'labels', 'text_detected')
+# Result fields every stored item has, so sorting on them needs no default
+REQUIRED_FIELDS = frozenset(RESULT_FIELDS[:5])
+
+# Range comparisons; :<prefix>0 holds the lower bound and :<prefix>1 the upper
+RANGE_CLAUSES = {
+    'between': '{name} BETWEEN :{prefix}0 AND :{prefix}1',
+    'from': '{name} >= :{prefix}0',
+    'to': '{name} <= :{prefix}1'
+}
+
+# Results per request are capped so a response stays well under Lambda's 6 MB
+# limit; pages are read until that many items match, up to MAX_PAGES pages
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+PAGE_SIZE = 100
+MAX_PAGES = 10
+
+# Scans without an indexable filter read this many table segments in parallel
+SCAN_SEGMENTS = 4
+scan_executor = ThreadPoolExecutor(max_workers=SCAN_SEGMENTS)
+
+# Accepted spellings of a true sort_desc flag; anything else sorts ascending
+TRUE_VALUES = frozenset(['true', 'True', 'TRUE', '1', 'yes', 'y', 't'])
+
+# Same tokenization the ingest Lambdas use to build each item's search_tokens set
+TOKEN_RE = re.compile(r'[a-z0-9]+')
 
 def handler(event, context):
     """Handle search requests for files and metadata"""
@@ -16,11 +81,18 @@ def handler(event, context):
         # Build base query
         query_params = build_query(params)
 
-        # Execute search
-        response = table.scan(**query_params)
+        # Pagination
+        limit = max(1, min(int(params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT))
+        cursor = loads(params['last_key']) if 'last_key' in params else None
 
-        # Process results
-        results = process_results(response['Items'], params)
+        # Execute search, using the index when the filters allow it
+        if 'KeyConditionExpression' in query_params:
+            raw_items, next_cursor = paginate('query', query_params, limit, cursor)
+        else:
+            raw_items, next_cursor = parallel_scan(query_params, limit, cursor)
+
+        # Process results; category index queries come back ordered by last_modified
+        results = process_results(raw_items, params, query_params.get('IndexName') == CONTENT_CATEGORY_INDEX)
 
         return {
             'statusCode': 200,
@@ -28,10 +100,10 @@ def handler(event, context):
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*'
             },
-            'body': json.dumps({
+            'body': dumps({
                 'results': results,
                 'count': len(results),
-                'last_evaluated_key': response.get('LastEvaluatedKey')
+                'last_evaluated_key': next_cursor
             })
         }
     except Exception as e:
@@ -41,105 +113,243 @@ def handler(event, context):
                 'Content-Type': 'application/json',
                 'Access-Control-Allow-Origin': '*'
             },
-            'body': json.dumps({
+            'body': dumps({
                 'error': str(e)
             })
         }
 
+def dumps(body):
+    """Serialize a response body to a JSON string"""
+    if orjson is not None:
+        return orjson.dumps(body).decode()
+    return json.dumps(body)
+
+def loads(text):
+    """Parse a JSON request parameter"""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+def paginate(operation, query_params, limit, start_key=None):
+    """Collect up to `limit` matching items, following pages until they are found"""
+    # Pages are followed by hand since the DAX client has no paginators; each
+    # page asks for at most the items still needed, so none are cut off and the
+    # last page's key is where the next request resumes
+    call = getattr(dynamodb, operation)
+    items = []
+    # Reads per request are bounded when the filters match few items
+    for _ in range(MAX_PAGES):
+        page_params = {**query_params, 'Limit': min(limit - len(items), PAGE_SIZE)}
+        if start_key:
+            page_params['ExclusiveStartKey'] = start_key
+        page = call(**page_params)
+        items.extend(page['Items'])
+        start_key = page.get('LastEvaluatedKey')
+        if start_key is None or len(items) >= limit:
+            break
+
+    return items, start_key
+
+def parallel_scan(query_params, limit, cursor=None):
+    """Scan the table segments concurrently and combine their results"""
+    # A scan cursor holds one start key per segment: {} until the segment is
+    # first read and None once it is done
+    start_keys = cursor if isinstance(cursor, list) and len(cursor) == SCAN_SEGMENTS else [{}] * SCAN_SEGMENTS
+    active = [segment for segment in range(SCAN_SEGMENTS) if start_keys[segment] is not None]
+    if not active:
+        return [], None
+
+    # Split the limit over the unfinished segments so the quotas add up to it
+    quotas = {
+        segment: limit // len(active) + (rank < limit % len(active))
+        for rank, segment in enumerate(active)
+    }
+
+    def scan_segment(segment):
+        # Segments without a quota keep their place for the next request
+        if not quotas.get(segment):
+            return [], start_keys[segment]
+        segment_params = {**query_params, 'Segment': segment, 'TotalSegments': SCAN_SEGMENTS}
+        return paginate('scan', segment_params, quotas[segment], start_keys[segment])
+
+    segments = list(scan_executor.map(scan_segment, range(SCAN_SEGMENTS)))
+    keys = [key for _, key in segments]
+
+    return [item for items, _ in segments for item in items], keys if any(key is not None for key in keys) else None
+
+def read_item(item):
+    """Convert a projected item from raw attribute values using the result schema"""
+    # size is the only number; the list fields hold strings, everything else is a string
+    result = {}
+    for name, value in item.items():
+        if name == 'size':
+            result[name] = int(value['N'])
+        elif 'L' in value:
+            result[name] = [element['S'] for element in value['L']]
+        else:
+            result[name] = value['S']
+    return result
+
 def build_query(params):
     """Build DynamoDB query parameters based on search criteria"""
-    filter_expression = None
+    values = {}
 
-    # Text search
-    if 'query' in params:
-        filter_expression = Attr('file_name').contains(params['query'])
+    # Text search; every query token must be in the item's search_tokens set,
+    # which covers the file name, labels and extracted text
+    terms = sorted(set(TOKEN_RE.findall(params['query'].lower()))) if 'query' in params else []
+    values.update({f':t{i}': {'S': term} for i, term in enumerate(terms)})
+    name_search = 'query' in params and not terms
+    if name_search:
+        values[':q'] = {'S': params['query']}
 
-        # Search in extracted text if available
-        text_expr = Attr('text_content').contains(params['query']) if 'text_content' in params else None
-        if text_expr:
-            filter_expression = filter_expression | text_expr
+    # Case-insensitive file name prefix; the name index is the most selective,
+    # so it takes precedence over the category index
+    name_prefix = params.get('name_prefix', '').lower()
+    if name_prefix:
+        values[':ni'] = {'S': name_prefix[0]}
+        values[':np'] = {'S': name_prefix}
 
-    # File type filter
+    # File type filter; a full top-level type can be answered from the category index
+    by_category = by_prefix = False
     if 'type' in params:
-        type_expr = Attr('content_type').begins_with(params['type'])
-        filter_expression = type_expr if not filter_expression else filter_expression & type_expr
+        category = params['type'].partition('/')[0]
+        by_category = category in CONTENT_CATEGORIES and not name_prefix
+        by_prefix = not by_category or params['type'] != category
+        if by_category:
+            values[':cat'] = {'S': category}
+        if by_prefix:
+            values[':type'] = {'S': params['type']}
 
     # Date range filter
+    date_bounds = None
     if 'date_from' in params or 'date_to' in params:
-        date_expr = build_date_filter(params)
-        filter_expression = date_expr if not filter_expression else filter_expression & date_expr
+        date_bounds, date_values = build_date_filter(params)
+        values.update(date_values)
 
     # Size range filter
+    size_bounds = None
     if 'size_min' in params or 'size_max' in params:
-        size_expr = build_size_filter(params)
-        filter_expression = size_expr if not filter_expression else filter_expression & size_expr
+        size_bounds, size_values = build_size_filter(params)
+        values.update(size_values)
 
+    # The expression strings only depend on which filters are present
     query_params = {
-        'FilterExpression': filter_expression,
-        'Limit': int(params.get('limit', 50))
+        **expression_template(
+            len(terms), name_search, bool(name_prefix), by_category, by_prefix,
+            date_bounds, size_bounds, 'include_text' in params
+        ),
+        'TableName': TABLE_NAME
     }
-
-    # Pagination
-    if 'last_key' in params:
-        query_params['ExclusiveStartKey'] = json.loads(params['last_key'])
+    if values:
+        query_params['ExpressionAttributeValues'] = values
+    if by_category:
+        # Read the index in the requested last_modified order so pages resumed
+        # from last_key continue the same ordering
+        query_params['ScanIndexForward'] = params.get('sort_desc', 'true') not in TRUE_VALUES
 
     return query_params
 
+@lru_cache(maxsize=64)
+def expression_template(term_count, name_search, by_name_prefix, by_category, by_prefix,
+                        date_bounds, size_bounds, include_text):
+    """Build the expressions and attribute names for one combination of search filters"""
+    key_conditions = []
+    filters = []
+    names = {}
+
+    if term_count:
+        filters.extend(f'contains(#tok, :t{i})' for i in range(term_count))
+        names['#tok'] = 'search_tokens'
+    elif name_search:
+        filters.append('contains(#fn, :q)')
+        names['#fn'] = 'file_name'
+
+    if by_name_prefix:
+        key_conditions.append('#ni = :ni AND begins_with(#nlc, :np)')
+        names['#ni'] = 'name_initial'
+        names['#nlc'] = 'file_name_lc'
+    if by_category:
+        key_conditions.append('#cat = :cat')
+        names['#cat'] = 'content_category'
+    if by_prefix:
+        filters.append('begins_with(#ct, :type)')
+        names['#ct'] = 'content_type'
+
+    # Part of the key condition when querying the category index
+    if date_bounds:
+        date_clause = RANGE_CLAUSES[date_bounds].format(name='#lm', prefix='d')
+        (key_conditions if by_category else filters).append(date_clause)
+        names['#lm'] = 'last_modified'
+
+    if size_bounds:
+        filters.append(RANGE_CLAUSES[size_bounds].format(name='#sz', prefix='s'))
+        names['#sz'] = 'size'
+
+    # Only read the attributes the response returns
+    fields = RESULT_FIELDS + ('text_content',) if include_text else RESULT_FIELDS
+    names.update({f'#f{i}': field for i, field in enumerate(fields)})
+
+    # Shared by every request with these filters, so never modified after this
+    template = {
+        'ProjectionExpression': ', '.join(f'#f{i}' for i in range(len(fields))),
+        'ExpressionAttributeNames': names
+    }
+    if key_conditions:
+        template['IndexName'] = NAME_PREFIX_INDEX if by_name_prefix else CONTENT_CATEGORY_INDEX
+        template['KeyConditionExpression'] = ' AND '.join(key_conditions)
+    if filters:
+        template['FilterExpression'] = ' AND '.join(filters)
+
+    return template
+
 def build_date_filter(params):
-    """Build date range filter expression"""
+    """Get the date range bounds and their attribute values"""
     date_from = params.get('date_from')
     date_to = params.get('date_to')
 
     if date_from and date_to:
-        return Attr('last_modified').between(date_from, date_to)
+        return 'between', {':d0': {'S': date_from}, ':d1': {'S': date_to}}
     elif date_from:
-        return Attr('last_modified').gte(date_from)
+        return 'from', {':d0': {'S': date_from}}
     else:
-        return Attr('last_modified').lte(date_to)
+        return 'to', {':d1': {'S': date_to}}
 
 def build_size_filter(params):
-    """Build file size filter expression"""
-    size_min = int(params.get('size_min', 0))
-    size_max = int(params.get('size_max', float('inf')))
-
-    if size_min and size_max < float('inf'):
-        return Attr('size').between(size_min, size_max)
-    elif size_min:
-        return Attr('size').gte(size_min)
+    """Get the file size bounds and their attribute values"""
+    # Bounds are applied whenever given, including size_min=0; a lone lower
+    # bound of zero or less matches every file and needs no filter
+    has_min = 'size_min' in params
+    has_max = 'size_max' in params
+
+    if has_min and has_max:
+        return 'between', {
+            ':s0': {'N': str(int(params['size_min']))},
+            ':s1': {'N': str(int(params['size_max']))}
+        }
+    elif has_min:
+        size_min = int(params['size_min'])
+        if size_min <= 0:
+            return None, {}
+        return 'from', {':s0': {'N': str(size_min)}}
     else:
-        return Attr('size').lte(size_max)
+        return 'to', {':s1': {'N': str(int(params['size_max']))}}
 
-def process_results(items, params):
+def process_results(raw_items, params, sorted_by_index=False):
     """Process and format search results"""
-    # Sort results if requested
-    sort_key = params.get('sort_by', 'last_modified')
-    sort_desc = params.get('sort_desc', 'true').lower() == 'true'
-
-    sorted_items = sorted(
-        items,
-        key=lambda x: x.get(sort_key, ''),
-        reverse=sort_desc
-    )
-
-    # Format results
-    results = []
-    for item in sorted_items:
-        result = {
-            'file_id': item['file_id'],
-            'file_name': item['file_name'],
-            'size': item['size'],
-            'last_modified': item['last_modified'],
-            'content_type': item['content_type']
-        }
+    # Projected items only carry the result fields, so converting them is the
+    # whole formatting step; the list it builds is then sorted in place
+    results = [read_item(item) for item in raw_items]
 
-        # Add analysis results if available
-        if 'labels' in item:
-            result['labels'] = item['labels']
-        if 'text_detected' in item:
-            result['text_detected'] = item['text_detected']
-        if 'text_content' in item:
-            result['text_content'] = item['text_content']
+    # Sort results if requested, unless the index already returned them in order
+    sort_key = params.get('sort_by', 'last_modified')
+    sort_desc = params.get('sort_desc', 'true') in TRUE_VALUES
 
-        results.append(result)
+    if sorted_by_index and sort_key == 'last_modified':
+        return results
 
-    return results
\ No newline at end of file
+    if sort_key in REQUIRED_FIELDS:
+        key = itemgetter(sort_key)
+    else:
+        key = lambda x: x.get(sort_key, '')
+    results.sort(key=key, reverse=sort_desc)
+    return results
@@ -1,16 +1,25 @@
 import boto3
 import json
 import os
-import uuid
+import secrets
 import hashlib
 import base64
 import mimetypes
 import re
+import time
 from datetime import datetime, timedelta
+from functools import cache
+from botocore.config import Config
 
-s3 = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
-lambda_client = boto3.client('lambda')
+# Shared client config: pooled keep-alive connections and adaptive retries
+BOTO_CONFIG = Config(
+    max_pool_connections=50,
+    tcp_keepalive=True,
+    retries={'max_attempts': 3, 'mode': 'adaptive'}
+)
+
+s3 = boto3.client('s3', config=BOTO_CONFIG)
+dynamodb = boto3.resource('dynamodb', config=BOTO_CONFIG)
 table = dynamodb.Table(os.environ['TABLE_NAME'])
 bucket_name = os.environ['BUCKET_NAME']
 
@@ -28,9 +37,32 @@ ALLOWED_EXTENSIONS = [
     # Other
     '.json', '.xml', '.html', '.css', '.js'
 ]
+# Set form of ALLOWED_EXTENSIONS for membership checks; the list keeps its
+# order for the error response
+ALLOWED_EXTENSION_SET = frozenset(ALLOWED_EXTENSIONS)
+
+# Encoded once for the extension rejection response
+ALLOWED_EXTENSIONS_JSON = json.dumps(ALLOWED_EXTENSIONS)
+
+# Shared headers for JSON error responses
+JSON_HEADERS = {'Content-Type': 'application/json'}
 
 VIRUS_SCAN_ENDPOINT = os.environ.get('VIRUS_SCAN_ENDPOINT', None)
 
+# Lowercased alphanumeric runs, stored as a string set for token search
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Characters replaced with '_' when building an object key from a filename
+SANITIZE_RE = re.compile(r'[^\w\-.]')
+
+def error_response(status_code, message, **extra):
+    """Build a JSON error response"""
+    return {
+        'statusCode': status_code,
+        'headers': JSON_HEADERS,
+        'body': json.dumps({'error': message, **extra})
+    }
+
 def handler(event, context):
     """Handle file upload requests"""
     try:
@@ -44,19 +76,11 @@ def handler(event, context):
             # Handle post-upload processing
             return process_upload(event)
         else:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({'error': 'Unsupported HTTP method'})
-            }
+            return error_response(400, 'Unsupported HTTP method')
             
     except Exception as e:
         print(f"Error in upload handler: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'error': str(e)})
-        }
+        return error_response(500, str(e))
 
 def generate_presigned_url(event):
     """Generate presigned URL for direct S3 upload"""
@@ -64,11 +88,7 @@ def generate_presigned_url(event):
     
     # Validate required parameters
     if 'filename' not in params:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'error': 'Filename is required'})
-        }
+        return error_response(400, 'Filename is required')
     
     filename = params['filename']
     content_type = params.get('contentType', 'application/octet-stream')
@@ -76,31 +96,24 @@ def generate_presigned_url(event):
     
     # Validate file extension
     file_extension = os.path.splitext(filename)[1].lower()
-    if file_extension not in ALLOWED_EXTENSIONS:
+    if file_extension not in ALLOWED_EXTENSION_SET:
+        # Splice in the pre-encoded list instead of encoding it per request
+        error = json.dumps(f'File type {file_extension} not allowed')
         return {
             'statusCode': 400,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({
-                'error': f'File type {file_extension} not allowed',
-                'allowedTypes': ALLOWED_EXTENSIONS
-            })
+            'headers': JSON_HEADERS,
+            'body': f'{{"error": {error}, "allowedTypes": {ALLOWED_EXTENSIONS_JSON}}}'
         }
     
     # Validate file size
     if file_size > MAX_FILE_SIZE:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({
-                'error': 'File size exceeds maximum allowed',
-                'maxSize': MAX_FILE_SIZE
-            })
-        }
+        return error_response(400, 'File size exceeds maximum allowed', maxSize=MAX_FILE_SIZE)
     
     # Generate unique key with folder structure
-    date_prefix = datetime.now().strftime('%Y/%m/%d')
-    file_id = str(uuid.uuid4())
-    safe_filename = re.sub(r'[^\w\-\.]', '_', filename)
+    year, month, day = time.gmtime()[:3]
+    date_prefix = f"{year}/{month:02d}/{day:02d}"
+    file_id = secrets.token_hex(16)
+    safe_filename = SANITIZE_RE.sub('_', filename)
     key = f"{date_prefix}/{file_id}/{safe_filename}"
     
     # Generate presigned URL
@@ -138,11 +151,7 @@ def process_upload(event):
     
     # Validate request
     if 'key' not in body:
-        return {
-            'statusCode': 400,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'error': 'File key is required'})
-        }
+        return error_response(400, 'File key is required')
     
     key = body['key']
     
@@ -151,7 +160,7 @@ def process_upload(event):
         response = s3.head_object(Bucket=bucket_name, Key=key)
         
         # Generate file ID if not provided
-        file_id = response.get('Metadata', {}).get('file_id', str(uuid.uuid4()))
+        file_id = response.get('Metadata', {}).get('file_id') or secrets.token_hex(16)
         
         # Store initial metadata
         metadata = {
@@ -165,6 +174,15 @@ def process_upload(event):
             'last_modified': response['LastModified'].isoformat(),
             'upload_status': 'processing'
         }
+        metadata['content_category'] = metadata['content_type'].partition('/')[0]
+        search_tokens = set(TOKEN_RE.findall(metadata['file_name'].lower()))
+        if search_tokens:
+            metadata['search_tokens'] = search_tokens
+        # Keys of the name index, for case-insensitive file name prefix search
+        file_name_lc = metadata['file_name'].lower()
+        if file_name_lc:
+            metadata['file_name_lc'] = file_name_lc
+            metadata['name_initial'] = file_name_lc[0]
         
         # Scan for viruses if configured
         if VIRUS_SCAN_ENDPOINT:
@@ -179,14 +197,7 @@ def process_upload(event):
                 # Delete infected file
                 s3.delete_object(Bucket=bucket_name, Key=key)
                 
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json'},
-                    'body': json.dumps({
-                        'error': 'Virus detected',
-                        'scanResult': scan_result
-                    })
-                }
+                return error_response(400, 'Virus detected', scanResult=scan_result)
         
         # Store initial metadata
         table.put_item(Item=metadata)
@@ -209,11 +220,7 @@ def process_upload(event):
         
     except Exception as e:
         print(f"Error processing upload: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'error': str(e)})
-        }
+        return error_response(500, str(e))
 
 def scan_file(bucket, key):
     """Scan file for viruses using ClamAV or similar service"""
@@ -235,7 +242,6 @@ def scan_file(bucket, key):
         # For demonstration, we'll simulate a scan result
         
         # Mock implementation (replace with actual service call)
-        import hashlib
         file_hash = hashlib.md5(f"{bucket}{key}".encode()).hexdigest()
         is_infected = file_hash.startswith('a')  # Simulate ~6% of files as infected
         
@@ -258,6 +264,11 @@ def scan_file(bucket, key):
             'error_message': str(e)
         }
 
+@cache
+def get_lambda_client():
+    """Create the Lambda client on first use; presigned URL requests never need it"""
+    return boto3.client('lambda', config=BOTO_CONFIG)
+
 def trigger_metadata_extraction(bucket, key):
     """Trigger metadata extraction Lambda"""
     try:
@@ -280,7 +291,7 @@ def trigger_metadata_extraction(bucket, key):
         # Invoke metadata analyzer Lambda asynchronously
         analyzer_function = os.environ.get('METADATA_ANALYZER_FUNCTION')
         if analyzer_function:
-            lambda_client.invoke(
+            get_lambda_client().invoke(
                 FunctionName=analyzer_function,
                 InvocationType='Event',
                 Payload=json.dumps(event)
@@ -2,71 +2,111 @@ import boto3
 import json
 import os
 import subprocess
-import tempfile
 import time
-import shutil
 import uuid
 import logging
 import base64
+import hashlib
+import socket
+import struct
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
+from botocore.config import Config
+from boto3.dynamodb.conditions import Key
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize AWS clients
-s3 = boto3.client('s3')
-dynamodb = boto3.resource('dynamodb')
-sns = boto3.client('sns')
+# Initialize AWS clients once per container. The connection pool is sized for
+# concurrent record workers plus parallel ranged GETs, and connections are kept alive
+BOTO_CONFIG = Config(
+    max_pool_connections=64,
+    tcp_keepalive=True,
+    retries={'mode': 'adaptive', 'max_attempts': 4}
+)
+s3 = boto3.client('s3', config=BOTO_CONFIG)
+dynamodb = boto3.resource('dynamodb', config=BOTO_CONFIG)
+sns = boto3.client('sns', config=BOTO_CONFIG)
 
 # Environment variables
 QUARANTINE_BUCKET = os.environ.get('QUARANTINE_BUCKET')
 METADATA_TABLE = os.environ.get('METADATA_TABLE')
 NOTIFICATION_TOPIC = os.environ.get('NOTIFICATION_TOPIC')
 
-# Lambda's temp directory for downloads
-TEMP_DIR = '/tmp'
-VIRUS_DB_PATH = '/tmp/virus-db'
+# Metadata table and the GSI used to resolve file_id from an S3 location
+metadata_table = dynamodb.Table(METADATA_TABLE) if METADATA_TABLE else None
+BUCKET_KEY_INDEX = 'bucket-key-index'
+
+# clamd daemon from the ClamAV layer; keeps the signature DB loaded between scans
+CLAMD_BIN = '/opt/bin/clamd'
+CLAMD_CONF = '/opt/etc/clamd.conf'
+CLAMD_SOCKET = '/tmp/clamd.sock'
+CLAMD_CHUNK_SIZE = 64 * 1024
+CLAMD_STARTUP_TIMEOUT = 60
+# Record workers check clamd concurrently; only one of them may start it
+clamd_start_lock = threading.Lock()
+
+# S3 objects are streamed straight into the scanner in chunks of this size
+S3_READ_CHUNK_SIZE = 1024 * 1024
+
+# Larger objects are fetched as parallel ranged GETs, since a single stream
+# rarely saturates the Lambda network link
+S3_RANGE_THRESHOLD = 8 * 1024 * 1024
+S3_RANGE_CHUNK_SIZE = 16 * 1024 * 1024
+S3_RANGE_CONCURRENCY = 16
+range_pool = ThreadPoolExecutor(max_workers=S3_RANGE_CONCURRENCY)
+# Fetched ranges held at once across all records, which caps their memory at
+# S3_RANGE_CONCURRENCY * S3_RANGE_CHUNK_SIZE however many files stream together
+range_slots = threading.BoundedSemaphore(S3_RANGE_CONCURRENCY)
+
+# Records in one S3 event are scanned concurrently, up to this many at once
+MAX_RECORD_WORKERS = 16
+
+# DeleteObjects accepts at most this many keys per request
+S3_DELETE_BATCH_SIZE = 1000
+
+# PublishBatch accepts at most this many messages per request
+SNS_PUBLISH_BATCH_SIZE = 10
+
+# SHA-256 digests of small objects recently found clean, mapped to their expiry
+# time and scanner version. Exact digests rather than a probabilistic filter, since a false positive
+# would skip scanning an unscanned file
+CLEAN_CACHE_TTL = 24 * 60 * 60
+CLEAN_CACHE_MAX_ENTRIES = 10000
+clean_cache = {}
+clean_cache_lock = threading.Lock()
 
 def handler(event, context):
     """Handler for virus scanning Lambda function"""
     try:
-        # Process S3 event
-        records = event.get('Records', [])
+        # Process S3 event; each record is I/O-bound, so scan them in parallel
+        records = [record for record in event.get('Records', []) if 's3' in record]
         results = []
         
-        for record in records:
-            # Extract S3 bucket and key
-            if 's3' not in record:
-                continue
-                
-            bucket = record['s3']['bucket']['name']
-            key = record['s3']['object']['key']
-            
-            logger.info(f"Processing file: s3://{bucket}/{key}")
+        if records:
+            # Resolve all file_ids up front instead of one lookup per worker
+            file_ids = resolve_file_ids([
+                (record['s3']['bucket']['name'], record['s3']['object']['key'])
+                for record in records
+            ])
             
-            # Skip very large files (adjust threshold as needed)
-            file_size = get_file_size(bucket, key)
-            if file_size > 500 * 1024 * 1024:  # 500MB
-                logger.warning(f"File too large for scanning: {file_size} bytes")
-                results.append({
-                    'bucket': bucket, 
-                    'key': key,
-                    'status': 'skipped',
-                    'reason': 'file too large'
-                })
-                continue
-            
-            # Scan the file
-            scan_result = scan_s3_file(bucket, key)
-            results.append(scan_result)
-            
-            # Update metadata in DynamoDB
-            update_metadata(bucket, key, scan_result)
-            
-            # Take action based on scan results
-            if scan_result.get('threat_detected', False):
-                handle_infected_file(bucket, key, scan_result)
+            batch_time = datetime.now()
+            try:
+                with ThreadPoolExecutor(max_workers=min(len(records), MAX_RECORD_WORKERS)) as executor:
+                    for result in executor.map(
+                        partial(process_record, file_ids=file_ids, batch_time=batch_time),
+                        records
+                    ):
+                        results.append(result)
+            finally:
+                # Remove quarantined originals and notify in bulk rather than per
+                # file, for every result produced even if the batch failed part way
+                delete_quarantined_files(results)
+                notify_infected_files(results, batch_time)
         
         return {
             'statusCode': 200,
@@ -85,37 +125,140 @@ def handler(event, context):
             })
         }
 
+def process_record(record, file_ids=None, batch_time=None):
+    """Scan a single S3 event record and act on the result"""
+    batch_time = batch_time or datetime.now()
+    # Extract S3 bucket and key
+    bucket = record['s3']['bucket']['name']
+    key = record['s3']['object']['key']
+    
+    logger.info(f"Processing file: s3://{bucket}/{key}")
+    
+    try:
+        # Skip very large files (adjust threshold as needed); S3 events carry the
+        # object size, so only fall back to a HEAD request when it is missing
+        file_size = record['s3']['object'].get('size')
+        if file_size is None:
+            file_size = get_file_size(bucket, key)
+        if file_size > 500 * 1024 * 1024:  # 500MB
+            logger.warning(f"File too large for scanning: {file_size} bytes")
+            return {
+                'bucket': bucket, 
+                'key': key,
+                'status': 'skipped',
+                'reason': 'file too large'
+            }
+        
+        # Scan the file
+        scan_result = scan_s3_file(bucket, key, file_size)
+        
+        # Update metadata in DynamoDB
+        update_metadata(bucket, key, scan_result, (file_ids or {}).get((bucket, key)))
+        
+        # Take action based on scan results
+        if scan_result.get('threat_detected', False):
+            quarantine_key = handle_infected_file(bucket, key, scan_result, batch_time)
+            if quarantine_key:
+                scan_result['quarantine_key'] = quarantine_key
+        
+        return scan_result
+        
+    except Exception as e:
+        # Report the failure as this record's result so the rest of the batch,
+        # including files already quarantined, is still finished
+        logger.error(f"Error processing {bucket}/{key}: {str(e)}")
+        return {
+            'bucket': bucket,
+            'key': key,
+            'scan_timestamp': datetime.now().isoformat(),
+            'scan_status': 'error',
+            'error_message': str(e)
+        }
+
 def get_file_size(bucket, key):
     """Get file size from S3 metadata"""
     response = s3.head_object(Bucket=bucket, Key=key)
     return response['ContentLength']
 
-def scan_s3_file(bucket, key):
-    """Download and scan an S3 file for viruses"""
+def iter_s3_ranges(bucket, key, size):
+    """Yield an S3 object's bytes in order while fetching ranges in parallel"""
+    def fetch(start):
+        end = min(start + S3_RANGE_CHUNK_SIZE, size) - 1
+        response = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}")
+        return response['Body'].read()
+    
+    starts = deque(range(0, size, S3_RANGE_CHUNK_SIZE))
+    pending = deque()
+    try:
+        while starts or pending:
+            # Keep a window of ranges in flight, taking slots from the shared
+            # budget only while they are free; with nothing in flight, wait
+            # for a slot so every record keeps making progress
+            while (starts and len(pending) < S3_RANGE_CONCURRENCY
+                   and range_slots.acquire(blocking=not pending)):
+                pending.append(range_pool.submit(fetch, starts.popleft()))
+            
+            # A range's slot is held until the consumer is done with its bytes
+            future = pending.popleft()
+            try:
+                yield future.result()
+            finally:
+                range_slots.release()
+    finally:
+        for future in pending:
+            future.cancel()
+            range_slots.release()
+
+def fanout_chunks(chunks, *sinks):
+    """Pass each chunk to every sink as it streams through to the consumer"""
+    for chunk in chunks:
+        for sink in sinks:
+            sink(chunk)
+        yield chunk
+
+def scan_s3_file(bucket, key, size=None):
+    """Stream an S3 file into the virus scanner"""
     scan_id = str(uuid.uuid4())
-    download_path = os.path.join(TEMP_DIR, scan_id)
+    body = None
     
     try:
-        # Download file
-        logger.info(f"Downloading file: {bucket}/{key}")
-        s3.download_file(bucket, key, download_path)
-        
         # Ensure ClamAV is available
         ensure_clamav()
         
-        # Scan the file
-        logger.info(f"Scanning file: {download_path}")
-        result = run_clamav_scan(download_path)
+        logger.info(f"Scanning file: {bucket}/{key}")
+        sha256 = hashlib.sha256()
+        cached = False
+        if size is not None and size < S3_RANGE_THRESHOLD:
+            # Small objects are hashed before scanning so that repeats of
+            # recently scanned clean content can skip the scanner
+            content = s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+            sha256.update(content)
+            result = get_clean_result(sha256.hexdigest())
+            cached = result is not None
+            if not cached:
+                result = run_clamav_scan([content])
+                if not result['infected']:
+                    remember_clean(sha256.hexdigest(), result.get('version', 'unknown'))
+        else:
+            # Scan the object body as it arrives from S3, without staging it in
+            # /tmp, hashing it in the same pass
+            if size is not None:
+                chunks = iter_s3_ranges(bucket, key, size)
+            else:
+                body = s3.get_object(Bucket=bucket, Key=key)['Body']
+                chunks = body.iter_chunks(S3_READ_CHUNK_SIZE)
+            result = run_clamav_scan(fanout_chunks(chunks, sha256.update))
         
         scan_result = {
             'bucket': bucket,
             'key': key,
             'scan_id': scan_id,
             'scan_timestamp': datetime.now().isoformat(),
-            'scan_status': 'completed',
+            'scan_status': 'cached' if cached else 'completed',
             'threat_detected': result['infected'],
             'scanner': 'clamav',
-            'scanner_version': result.get('version', 'unknown')
+            'scanner_version': result.get('version', 'unknown'),
+            'sha256': sha256.hexdigest()
         }
         
         if result['infected']:
@@ -137,41 +280,128 @@ def scan_s3_file(bucket, key):
             'error_message': str(e)
         }
     finally:
-        # Clean up
-        if os.path.exists(download_path):
-            os.remove(download_path)
+        # Release the S3 connection, including when the scan stopped early
+        if body is not None:
+            body.close()
+
+def get_clean_result(digest):
+    """Return a cached clean scan result for this SHA-256 digest, if any"""
+    with clean_cache_lock:
+        entry = clean_cache.get(digest)
+        if entry is None:
+            return None
+        expires_at, version = entry
+        if expires_at < time.time():
+            del clean_cache[digest]
+            return None
+        return {'infected': False, 'version': version}
+
+def remember_clean(digest, version):
+    """Record a clean verdict for content with this SHA-256 digest"""
+    with clean_cache_lock:
+        clean_cache.pop(digest, None)
+        clean_cache[digest] = (time.time() + CLEAN_CACHE_TTL, version)
+        # Dicts keep insertion order, so the first entries are the oldest
+        while len(clean_cache) > CLEAN_CACHE_MAX_ENTRIES:
+            del clean_cache[next(iter(clean_cache))]
 
 def ensure_clamav():
-    """Ensure ClamAV is installed and virus definitions are up to date"""
-    # In a real implementation, you would:
-    # 1. Use a Lambda layer with ClamAV pre-installed
-    # 2. Maintain virus definitions in S3 and download if needed
-    # 3. Use freshclam to update definitions periodically
+    """Ensure the clamd daemon is running and listening on its Unix socket"""
+    if clamd_alive():
+        return True
     
-    # Simulated implementation
-    if not os.path.exists('/usr/bin/clamscan'):
-        logger.info("ClamAV not detected, simulating installation")
+    if not os.path.exists(CLAMD_BIN):
+        logger.info("clamd not detected, falling back to simulated scanning")
+        return False
+    
+    with clamd_start_lock:
+        # Another worker may have started clamd while this one waited
+        if clamd_alive():
+            return True
         
-    if not os.path.exists(VIRUS_DB_PATH):
-        os.makedirs(VIRUS_DB_PATH, exist_ok=True)
-        logger.info("Creating virus database directory")
+        # A clamd that died in a warm container leaves its socket file behind
+        if os.path.exists(CLAMD_SOCKET):
+            logger.warning("clamd is not answering on its socket, restarting it")
+            os.unlink(CLAMD_SOCKET)
+        
+        # Virus definitions are baked into the layer by freshclam at build time,
+        # so clamd only has to load them once per container
+        logger.info("Starting clamd")
+        subprocess.Popen([CLAMD_BIN, '--config-file=' + CLAMD_CONF])
+        
+        deadline = time.time() + CLAMD_STARTUP_TIMEOUT
+        while time.time() < deadline:
+            if clamd_alive():
+                return True
+            time.sleep(0.1)
     
-    # In a real implementation, check database age and update if needed
+    raise RuntimeError(f"clamd did not open {CLAMD_SOCKET} within {CLAMD_STARTUP_TIMEOUT}s")
 
-def run_clamav_scan(file_path):
-    """Run ClamAV scan on a file"""
-    # In a real implementation, this would execute clamscan
-    # command = ['/usr/bin/clamscan', '--database=' + VIRUS_DB_PATH, '-v', file_path]
-    # output = subprocess.check_output(command, stderr=subprocess.STDOUT)
+def clamd_alive():
+    """Check that clamd answers PING on its Unix socket"""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(5)
+            sock.connect(CLAMD_SOCKET)
+            sock.sendall(b'nPING\n')
+            return sock.recv(16).strip() == b'PONG'
+    except OSError:
+        return False
+
+def clamd_instream(chunks):
+    """Stream chunks of data to clamd using the INSTREAM command"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(CLAMD_SOCKET)
+        sock.sendall(b'nINSTREAM\n')
+        
+        for chunk in chunks:
+            # clamd expects each chunk prefixed by its length as a 4-byte big-endian int
+            view = memoryview(chunk)
+            for offset in range(0, len(view), CLAMD_CHUNK_SIZE):
+                part = view[offset:offset + CLAMD_CHUNK_SIZE]
+                sock.sendall(struct.pack('!L', len(part)))
+                sock.sendall(part)
+        sock.sendall(struct.pack('!L', 0))
+        
+        reply = b''
+        while not reply.endswith(b'\n'):
+            data = sock.recv(4096)
+            if not data:
+                break
+            reply += data
+    
+    # Reply is "stream: OK", "stream: <signature> FOUND" or "<reason> ERROR"
+    reply = reply.decode().strip()
+    status = reply.rpartition(': ')[2]
+    if status == 'OK':
+        return {'infected': False}
+    if status.endswith(' FOUND'):
+        return {'infected': True, 'threat_name': status[:-len(' FOUND')]}
+    raise RuntimeError(f"clamd scan failed: {reply}")
+
+def run_clamav_scan(chunks):
+    """Run ClamAV scan on a file delivered as an iterable of byte chunks"""
+    if os.path.exists(CLAMD_SOCKET):
+        start = time.time()
+        result = clamd_instream(chunks)
+        result.update({
+            'version': '0.103.7',
+            'scan_time': round(time.time() - start, 3)
+        })
+        logger.info(f"Scan result: {result}")
+        return result
     
     # Simulated implementation
-    logger.info(f"Simulating virus scan on {file_path}")
+    logger.info("Simulating virus scan")
     time.sleep(1)  # Simulate scan time
     
-    # Generate deterministic result based on file content
-    with open(file_path, 'rb') as f:
-        content = f.read(4096)  # Read first 4KB
-        file_hash = hash(content)
+    # Generate deterministic result based on file content; the whole stream is
+    # consumed, as a real scan would, so callers see every chunk. SHA-256 is
+    # reproducible across containers, unlike the per-process salted hash()
+    content_hash = hashlib.sha256()
+    for chunk in chunks:
+        content_hash.update(chunk)
+    file_hash = int.from_bytes(content_hash.digest()[:8], 'little')
     
     # Simulate ~2% infection rate
     infected = (file_hash % 50 == 0)
@@ -194,27 +424,44 @@ def run_clamav_scan(file_path):
     logger.info(f"Scan result: {result}")
     return result
 
-def update_metadata(bucket, key, scan_result):
+def find_file_id(bucket, key):
+    """Find the file_id for an S3 location using the bucket-key GSI"""
+    response = metadata_table.query(
+        IndexName=BUCKET_KEY_INDEX,
+        KeyConditionExpression=Key('bucket').eq(bucket) & Key('key').eq(key),
+        ProjectionExpression='file_id',
+        Limit=1
+    )
+    
+    items = response.get('Items', [])
+    return items[0]['file_id'] if items else None
+
+def resolve_file_ids(locations):
+    """Resolve file_ids for a batch of S3 locations with parallel GSI queries"""
+    def lookup(location):
+        try:
+            return find_file_id(*location)
+        except Exception as e:
+            logger.error(f"Error looking up metadata for {location[0]}/{location[1]}: {str(e)}")
+            return None
+    
+    unique_locations = list(dict.fromkeys(locations))
+    if not unique_locations:
+        return {}
+    
+    with ThreadPoolExecutor(max_workers=min(len(unique_locations), MAX_RECORD_WORKERS)) as executor:
+        return dict(zip(unique_locations, executor.map(lookup, unique_locations)))
+
+def update_metadata(bucket, key, scan_result, file_id=None):
     """Update file metadata with scan results"""
     try:
-        table = dynamodb.Table(METADATA_TABLE)
+        # Metadata may have been written after the batch lookup, so retry once
+        if file_id is None:
+            file_id = find_file_id(bucket, key)
         
-        # Try to find the file metadata by key
-        response = table.scan(
-            FilterExpression="key = :key AND bucket = :bucket",
-            ExpressionAttributeValues={
-                ":key": key,
-                ":bucket": bucket
-            }
-        )
-        
-        items = response.get('Items', [])
-        if items:
-            file_metadata = items[0]
-            file_id = file_metadata['file_id']
-            
+        if file_id:
             # Update the metadata with scan results
-            table.update_item(
+            metadata_table.update_item(
                 Key={'file_id': file_id},
                 UpdateExpression="set scan_result = :r, upload_status = :s",
                 ExpressionAttributeValues={
@@ -230,17 +477,24 @@ def update_metadata(bucket, key, scan_result):
     except Exception as e:
         logger.error(f"Error updating metadata: {str(e)}")
 
-def handle_infected_file(bucket, key, scan_result):
-    """Handle an infected file according to security policy"""
+def handle_infected_file(bucket, key, scan_result, batch_time=None):
+    """Handle an infected file according to security policy
+    
+    Returns the quarantine key if the file was copied to quarantine; the
+    original is left in place for delete_quarantined_files to remove, and
+    notifications are sent for the whole batch by notify_infected_files.
+    """
+    quarantine_key = None
+    batch_time = batch_time or datetime.now()
     try:
-        # 1. Move to quarantine bucket if configured
+        # Move to quarantine bucket if configured
         if QUARANTINE_BUCKET:
-            quarantine_key = f"infected/{datetime.now().strftime('%Y%m%d')}/{os.path.basename(key)}"
+            target_key = f"infected/{batch_time:%Y%m%d}/{key.rpartition('/')[2]}"
             
             # Copy to quarantine
             s3.copy_object(
                 Bucket=QUARANTINE_BUCKET,
-                Key=quarantine_key,
+                Key=target_key,
                 CopySource={'Bucket': bucket, 'Key': key},
                 Metadata={
                     'threat_name': scan_result.get('threat_name', 'unknown'),
@@ -251,25 +505,83 @@ def handle_infected_file(bucket, key, scan_result):
                 MetadataDirective='REPLACE'
             )
             
-            logger.info(f"Moved infected file to quarantine: {QUARANTINE_BUCKET}/{quarantine_key}")
+            quarantine_key = target_key
+            logger.info(f"Copied infected file to quarantine: {QUARANTINE_BUCKET}/{quarantine_key}")
             
-            # Delete from original location
-            s3.delete_object(Bucket=bucket, Key=key)
-            logger.info(f"Deleted infected file from original location: {bucket}/{key}")
-        
-        # 2. Send notification
-        if NOTIFICATION_TOPIC:
-            sns.publish(
-                TopicArn=NOTIFICATION_TOPIC,
-                Subject=f"Virus detected: {scan_result.get('threat_name', 'Unknown threat')}",
-                Message=json.dumps({
+    except Exception as e:
+        logger.error(f"Error handling infected file: {str(e)}")
+    
+    return quarantine_key
+
+def delete_quarantined_files(results):
+    """Delete quarantined files from their original location, batched per bucket"""
+    keys_by_bucket = defaultdict(list)
+    for result in results:
+        if result.get('quarantine_key'):
+            keys_by_bucket[result['bucket']].append(result['key'])
+    
+    for bucket, keys in keys_by_bucket.items():
+        for i in range(0, len(keys), S3_DELETE_BATCH_SIZE):
+            batch = keys[i:i + S3_DELETE_BATCH_SIZE]
+            try:
+                response = s3.delete_objects(
+                    Bucket=bucket,
+                    Delete={
+                        'Objects': [{'Key': key} for key in batch],
+                        'Quiet': True
+                    }
+                )
+                
+                for error in response.get('Errors', []):
+                    logger.error(f"Error deleting infected file {bucket}/{error['Key']}: {error.get('Message')}")
+                logger.info(f"Deleted {len(batch)} infected files from original location: {bucket}")
+                
+            except Exception as e:
+                logger.error(f"Error deleting infected files from {bucket}: {str(e)}")
+
+def notify_infected_files(results, batch_time=None):
+    """Send notifications for infected files using SNS PublishBatch"""
+    if not NOTIFICATION_TOPIC:
+        return
+    
+    timestamp = (batch_time or datetime.now()).isoformat()
+    infected = [result for result in results if result.get('threat_detected', False)]
+    
+    for i in range(0, len(infected), SNS_PUBLISH_BATCH_SIZE):
+        batch = infected[i:i + SNS_PUBLISH_BATCH_SIZE]
+        entries = [
+            {
+                'Id': str(n),
+                'Subject': f"Virus detected: {scan_result.get('threat_name', 'Unknown threat')}",
+                'Message': json.dumps({
                     'message': 'Malware detected in uploaded file',
-                    'file': f"{bucket}/{key}",
+                    'file': f"{scan_result['bucket']}/{scan_result['key']}",
                     'scan_result': scan_result,
-                    'timestamp': datetime.now().isoformat()
+                    'timestamp': timestamp
                 })
+            }
+            for n, scan_result in enumerate(batch)
+        ]
+        
+        try:
+            response = sns.publish_batch(
+                TopicArn=NOTIFICATION_TOPIC,
+                PublishBatchRequestEntries=entries
             )
-            logger.info(f"Sent notification for infected file")
             
-    except Exception as e:
-        logger.error(f"Error handling infected file: {str(e)}")
\ No newline at end of file
+            for failure in response.get('Failed', []):
+                scan_result = batch[int(failure['Id'])]
+                logger.error(
+                    f"Error sending notification for {scan_result['bucket']}/{scan_result['key']}: "
+                    f"{failure.get('Message', failure.get('Code'))}"
+                )
+            logger.info(f"Sent {len(batch) - len(response.get('Failed', []))} notifications for infected files")
+            
+        except Exception as e:
+            logger.error(f"Error sending notifications for infected files: {str(e)}")
+
+# Start clamd during the init phase so warm invocations reuse the loaded engine
+try:
+    ensure_clamav()
+except Exception as e:
+    logger.error(f"Error starting clamd: {str(e)}")
\ No newline at end of file